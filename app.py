@@ -1,19 +1,45 @@
 # app.py (updated)
 import streamlit as st
-from reddit_algorithm import generate_posts, generate_comments, score_calendar, export_csv
+from reddit_algorithm import (
+    DATA_DIR, Workspace, WorkspaceRegistry, assign_keyword_ids, get_keywords,
+    plan_week, replan_week, search_best_week, score_calendar,
+)
 from datetime import datetime, timedelta
 import pandas as pd
-from pathlib import Path
+import os
 import traceback
-import json
+import uuid
+from pathlib import Path
+
+# set_page_config must be the first Streamlit command of the run
+st.set_page_config(page_title="Reddit Mastermind Planner", layout="wide")
 
 # ------------------------------
-# Data directory (stores inputs)
+# Per-session workspace (stores inputs)
 # ------------------------------
-DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
+# Uploads live in memory only unless REDDIT_MASTERMIND_WORKSPACE_DIR is set; then each
+# session persists to <dir>/<session id>/ and dirs idle for more than
+# REDDIT_MASTERMIND_WORKSPACE_MAX_AGE_DAYS (default 7) are deleted at startup.
+WORKSPACE_DIR = os.environ.get("REDDIT_MASTERMIND_WORKSPACE_DIR")
+WORKSPACE_MAX_AGE_DAYS = float(os.environ.get("REDDIT_MASTERMIND_WORKSPACE_MAX_AGE_DAYS", "7"))
+
+@st.cache_resource(show_spinner=False)
+def get_workspace_registry():
+    # shared by every session; ./data/ only seeds new workspaces and is never written
+    registry = WorkspaceRegistry(
+        max_workspaces=64,
+        root_dir=Path(WORKSPACE_DIR) if WORKSPACE_DIR else None,
+        seed=Workspace.from_dir(DATA_DIR, persist=False),
+    )
+    registry.prune(WORKSPACE_MAX_AGE_DAYS * 86400)
+    return registry
+
+if "workspace_id" not in st.session_state:
+    st.session_state["workspace_id"] = uuid.uuid4().hex
+registry = get_workspace_registry()
+workspace_was_loaded = st.session_state["workspace_id"] in registry
+workspace = registry.get(st.session_state["workspace_id"])
 
-st.set_page_config(page_title="Reddit Mastermind Planner", layout="wide")
 st.title("Reddit Mastermind — Content Calendar Generator")
 
 st.markdown("""
@@ -23,26 +49,26 @@ This app generates a weekly content calendar (posts + comments) for Reddit using
 - Subreddits
 - Keywords
 
-Simply upload CSV / Excel files. Uploaded data is saved to `./data/`.
+Simply upload CSV / Excel files. Uploaded data belongs to your session only and is kept in memory; `./data/` provides the starting inputs.
 """)
 
-# ------------------------------
-# File paths
-# ------------------------------
-company_path = DATA_DIR / "company.json"
-personas_path = DATA_DIR / "personas.json"
-subreddits_path = DATA_DIR / "subreddits.json"
-keywords_path = DATA_DIR / "keywords.json"
+if st.session_state.get("has_uploads") and not workspace_was_loaded and registry.root_dir is None:
+    st.warning(
+        "This session's workspace expired, so its inputs were reset to the defaults. "
+        "Files still attached below are re-applied; re-upload anything else."
+    )
+    st.session_state["has_uploads"] = False
 
 # ------------------------------
-# JSON file helpers
+# Workspace helpers
 # ------------------------------
-def save_json_file(path: Path, data):
+def save_input(name: str, data):
     try:
-        path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        workspace.set(name, data)
+        st.session_state["has_uploads"] = True
         return True
     except Exception as e:
-        st.error(f"Error saving {path.name}: {e}")
+        st.error(f"Error saving {name}: {e}")
         st.error(traceback.format_exc())
         return False
 
@@ -81,7 +107,7 @@ if uploaded_company:
     if df is not None and not df.empty:
         df.columns = [c.strip() for c in df.columns]
         company_dict = df.to_dict(orient='records')[0]
-        if save_json_file(company_path, company_dict):
+        if save_input("company", company_dict):
             st.success("Uploaded company info successfully.")
 
 # --- Upload Personas ---
@@ -109,7 +135,7 @@ if uploaded_personas:
             if "background" not in norm:
                 norm["background"] = ""
             normalized.append(norm)
-        if save_json_file(personas_path, normalized):
+        if save_input("personas", normalized):
             st.success("Uploaded personas successfully.")
 
 # --- Upload Subreddits ---
@@ -118,7 +144,7 @@ if uploaded_subs:
     if df is not None and not df.empty:
         df.columns = [c.strip() for c in df.columns]
         subs_list = first_nonempty_column(df)
-        if save_json_file(subreddits_path, subs_list):
+        if save_input("subreddits", subs_list):
             st.success("Uploaded subreddits successfully.")
 
 # --- Upload Keywords ---
@@ -126,14 +152,18 @@ if uploaded_keywords:
     df = read_file(uploaded_keywords)
     if df is not None and not df.empty:
         df.columns = [c.strip() for c in df.columns]
-        if "text" in df.columns:
-            kw_list = df["text"].dropna().astype(str).str.strip().tolist()
-        elif "keyword" in df.columns:
-            kw_list = df["keyword"].dropna().astype(str).str.strip().tolist()
+        text_col = "text" if "text" in df.columns else "keyword" if "keyword" in df.columns else None
+        id_col = "id" if "id" in df.columns else "keyword_id" if "keyword_id" in df.columns else None
+        if text_col:
+            rows = df[df[text_col].notna()]
+            kw_list = rows[text_col].astype(str).str.strip().tolist()
+            id_list = rows[id_col].fillna("").tolist() if id_col else None
         else:
             kw_list = first_nonempty_column(df)
-        keywords_list = [{"id": f"K{i+1}", "text": kw} for i, kw in enumerate(kw_list)]
-        if save_json_file(keywords_path, keywords_list):
+            id_list = None
+        # keep existing ids so replan_week only touches keywords that actually changed
+        keywords_list = assign_keyword_ids(kw_list, previous=get_keywords(workspace), ids=id_list)
+        if save_input("keywords", keywords_list):
             st.success("Uploaded keywords successfully.")
 
 # ------------------------------
@@ -154,7 +184,7 @@ def show_calendar_and_downloads(posts, comments, label_prefix=""):
 
     # Quality Preview Table (safe access)
     try:
-        score, details = score_calendar(posts or [], comments or [])
+        score, details = score_calendar(posts or [], comments or [], workspace=workspace)
     except Exception as e:
         st.error(f"Error scoring calendar: {e}")
         st.error(traceback.format_exc())
@@ -205,21 +235,15 @@ def show_calendar_and_downloads(posts, comments, label_prefix=""):
 # ------------------------------
 # Generate actions
 # ------------------------------
-col1, col2 = st.columns(2)
+col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("Generate Week"):
         week_start = datetime.now()
         try:
-            posts = generate_posts(num_posts=None, week_start=week_start)
-            comments = generate_comments(posts)
+            plan = plan_week(num_posts=None, week_start=week_start, workspace=workspace)
+            st.session_state["plan"] = plan
+            posts, comments = plan["posts"], plan["comments"]
             show_calendar_and_downloads(posts, comments)
-            # Save CSVs to project root
-            try:
-                export_csv(posts, comments, out_dir=Path('.'))
-                st.success("Generated CSVs saved to project root (./weekly_posts.csv, ./weekly_comments.csv)")
-            except Exception as e:
-                st.error(f"Failed to export CSVs: {e}")
-                st.error(traceback.format_exc())
         except Exception as e:
             st.error(f"Error generating week: {e}")
             st.error(traceback.format_exc())
@@ -228,18 +252,60 @@ with col2:
     if st.button("Generate Next Week (simulate)"):
         week_start = datetime.now() + timedelta(days=7)
         try:
-            posts = generate_posts(num_posts=None, week_start=week_start)
-            comments = generate_comments(posts)
+            plan = plan_week(num_posts=None, week_start=week_start, workspace=workspace)
+            st.session_state["plan"] = plan
+            posts, comments = plan["posts"], plan["comments"]
             show_calendar_and_downloads(posts, comments, label_prefix="next_")
-            try:
-                export_csv(posts, comments, out_dir=Path('.'))
-                st.success("Generated CSVs saved to project root (./weekly_posts.csv, ./weekly_comments.csv)")
-            except Exception as e:
-                st.error(f"Failed to export CSVs: {e}")
-                st.error(traceback.format_exc())
         except Exception as e:
             st.error(f"Error generating next week: {e}")
             st.error(traceback.format_exc())
 
+with col3:
+    if st.button("Update Week (after input changes)"):
+        if "plan" not in st.session_state:
+            st.info("Generate a week first.")
+        else:
+            try:
+                plan = replan_week(st.session_state["plan"], workspace=workspace)
+                st.session_state["plan"] = plan
+                st.success(f"Regenerated {len(plan['regenerated'])} item(s), removed {len(plan['removed'])}; everything else kept as-is.")
+                show_calendar_and_downloads(plan["posts"], plan["comments"])
+            except Exception as e:
+                st.error(f"Error updating week: {e}")
+                st.error(traceback.format_exc())
+
+# ------------------------------
+# Best-of-N search
+# ------------------------------
+st.subheader("Best-of-N search")
+col_n, col_seed, col_target, col_budget = st.columns(4)
+with col_n:
+    num_candidates = st.number_input("Candidates", min_value=1, max_value=256, value=8, step=1)
+with col_seed:
+    master_seed = st.number_input("Master seed", min_value=0, value=0, step=1)
+with col_target:
+    # off by default: nearly every seed already scores 10/10, so stopping there means best-of-1
+    stop_early = st.checkbox("Stop early at score", value=False)
+    target_score = st.number_input("Target score", min_value=0.0, max_value=10.0, value=10.0, step=0.1, disabled=not stop_early)
+with col_budget:
+    time_budget = st.number_input("Time budget (s)", min_value=1.0, value=30.0, step=1.0)
+
+if st.button("Search Best Week"):
+    try:
+        result = search_best_week(
+            candidates=int(num_candidates), master_seed=int(master_seed), week_start=datetime.now(),
+            workspace=workspace, target_score=target_score if stop_early else None, time_budget=time_budget,
+        )
+        st.session_state["plan"] = result["plan"]
+        st.success(
+            f"Best of {result['evaluated']} candidate(s): score {result['score']}/10, penalty {result['penalty']}, "
+            f"template repeats {result['repetition']} (seed {result['seed']}, "
+            f"stopped: {result['stopped']}, {result['candidates_per_sec']} candidates/sec)"
+        )
+        show_calendar_and_downloads(result["plan"]["posts"], result["plan"]["comments"])
+    except Exception as e:
+        st.error(f"Error searching: {e}")
+        st.error(traceback.format_exc())
+
 st.markdown("---")
 st.info("Reminder: the planner **does not** post to Reddit — it only generates text you can use for posting.")
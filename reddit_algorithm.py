@@ -1,9 +1,18 @@
 # reddit_algorithm.py
+import copy
+import hashlib
 import json
+import multiprocessing
+import os
 import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Iterator, Union
 
 DATA_DIR = Path("data")
 
@@ -102,17 +111,171 @@ def normalize_keywords(raw: Any) -> List[Dict]:
         return keywords
     return [{"id": "K1", "text": str(raw)}]
 
+def save_json(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write-then-rename so a concurrent reader never sees a half-written file
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+# ------------------------------
+# Workspaces (isolated input sets)
+# ------------------------------
+INPUT_NAMES = ("company", "personas", "subreddits", "keywords")
+WORKSPACE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class Workspace:
+    """In-memory set of raw inputs (company, personas, subreddits, keywords) for one client.
+
+    When data_dir is set, every set() is also written to data_dir/<name>.json so the
+    workspace can be reloaded later; otherwise nothing touches the filesystem.
+    """
+
+    def __init__(self, workspace_id: str = "default", inputs: Dict = None, data_dir: Path = None):
+        self.workspace_id = workspace_id
+        self.inputs = {k: v for k, v in (inputs or {}).items() if k in INPUT_NAMES and v is not None}
+        self.data_dir = Path(data_dir) if data_dir is not None else None
+
+    @classmethod
+    def from_dir(cls, data_dir: Path, workspace_id: str = "default", persist: bool = True) -> "Workspace":
+        data_dir = Path(data_dir)
+        inputs = {name: load_json(data_dir / f"{name}.json") for name in INPUT_NAMES}
+        return cls(workspace_id, inputs, data_dir if persist else None)
+
+    def get(self, name: str) -> Any:
+        return self.inputs.get(name)
+
+    def set(self, name: str, raw: Any) -> None:
+        if name not in INPUT_NAMES:
+            raise ValueError(f"unknown input {name!r}, expected one of {INPUT_NAMES}")
+        self.inputs[name] = raw
+        if self.data_dir is not None:
+            save_json(self.data_dir / f"{name}.json", raw)
+
+    def copy(self, workspace_id: str, data_dir: Path = None) -> "Workspace":
+        return Workspace(workspace_id, copy.deepcopy(self.inputs), data_dir)
+
+class WorkspaceRegistry:
+    """Thread-safe LRU of loaded workspaces, keyed by client/session id.
+
+    New workspaces start as a copy of `seed` (if given). With root_dir set, each
+    workspace persists to root_dir/<workspace_id>/ and is reloaded from there after
+    eviction; without it, evicted workspaces are simply dropped.
+    """
+
+    def __init__(self, max_workspaces: int = 64, root_dir: Path = None, seed: Workspace = None):
+        self.max_workspaces = max(1, int(max_workspaces))
+        self.root_dir = Path(root_dir) if root_dir is not None else None
+        self.seed = seed
+        self._workspaces: "OrderedDict[str, Workspace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._workspaces)
+
+    def __contains__(self, workspace_id: str) -> bool:
+        return workspace_id in self._workspaces
+
+    def get(self, workspace_id: str) -> Workspace:
+        if not WORKSPACE_ID_RE.match(str(workspace_id)):
+            raise ValueError(f"invalid workspace id {workspace_id!r}")
+        with self._lock:
+            ws = self._workspaces.get(workspace_id)
+            if ws is not None:
+                self._workspaces.move_to_end(workspace_id)
+                return ws
+            ws = self._load(workspace_id)
+            self._workspaces[workspace_id] = ws
+            while len(self._workspaces) > self.max_workspaces:
+                self._workspaces.popitem(last=False)
+            return ws
+
+    def drop(self, workspace_id: str) -> None:
+        with self._lock:
+            self._workspaces.pop(workspace_id, None)
+
+    def prune(self, max_age_seconds: float) -> List[str]:
+        """Delete persisted workspace dirs not written for max_age_seconds (loaded ones are kept)."""
+        if self.root_dir is None or not self.root_dir.is_dir():
+            return []
+        cutoff = time.time() - max_age_seconds
+        removed = []
+        with self._lock:
+            for ws_dir in self.root_dir.iterdir():
+                if not ws_dir.is_dir() or ws_dir.name in self._workspaces or not WORKSPACE_ID_RE.match(ws_dir.name):
+                    continue
+                files = [f for f in ws_dir.iterdir() if f.is_file()]
+                if max((f.stat().st_mtime for f in files), default=ws_dir.stat().st_mtime) >= cutoff:
+                    continue
+                for f in files:
+                    f.unlink()
+                try:
+                    ws_dir.rmdir()
+                except OSError:
+                    continue
+                removed.append(ws_dir.name)
+        return removed
+
+    def _load(self, workspace_id: str) -> Workspace:
+        data_dir = self.root_dir / workspace_id if self.root_dir is not None else None
+        if data_dir is not None and data_dir.is_dir():
+            return Workspace.from_dir(data_dir, workspace_id)
+        if self.seed is not None:
+            return self.seed.copy(workspace_id, data_dir)
+        return Workspace(workspace_id, data_dir=data_dir)
+
+def default_workspace() -> Workspace:
+    """Read-only view of DATA_DIR, used when callers don't pass a workspace."""
+    return Workspace.from_dir(DATA_DIR, persist=False)
+
+def assign_keyword_ids(texts: List[str], previous: List[Dict] = None, ids: List[str] = None) -> List[Dict]:
+    """Build keyword dicts for an upload without renumbering keywords that already exist.
+
+    An explicit id (from `ids`) wins; otherwise a text already present in `previous`
+    keeps its old id, and new texts get fresh ids after the highest one in use. Plan
+    dependencies are keyed by keyword id, so positional ids would make one inserted or
+    deleted row look like a change to every later keyword.
+    """
+    previous = previous or []
+    by_text = {}
+    for kw in previous:
+        by_text.setdefault(kw.get("text"), kw.get("id"))
+    explicit = [str(i).strip() if i is not None and str(i).strip() else None for i in (ids or [])]
+    explicit += [None] * (len(texts) - len(explicit))
+    used = {i for i in explicit if i}
+
+    def id_number(kw_id) -> int:
+        m = re.fullmatch(r"K(\d+)", str(kw_id))
+        return int(m.group(1)) if m else 0
+
+    next_number = max([id_number(kw.get("id")) for kw in previous] + [id_number(i) for i in used], default=0) + 1
+    out = []
+    for text, kw_id in zip(texts, explicit):
+        if not kw_id:
+            kw_id = by_text.get(text)
+            if not kw_id or kw_id in used:
+                while f"K{next_number}" in used:
+                    next_number += 1
+                kw_id = f"K{next_number}"
+            used.add(kw_id)
+        out.append({"id": kw_id, "text": text})
+    return out
+
 # ------------------------------
 # Public getters with safe defaults
 # ------------------------------
-def get_company() -> Dict:
-    company = normalize_company(load_json(DATA_DIR / "company.json"))
+def get_company(workspace: Workspace = None) -> Dict:
+    if workspace is None:
+        workspace = default_workspace()
+    company = normalize_company(workspace.get("company"))
     if not company.get("name"):
         company["name"] = "Company"
     return company
 
-def get_personas() -> List[Dict]:
-    personas = normalize_personas(load_json(DATA_DIR / "personas.json"))
+def get_personas(workspace: Workspace = None) -> List[Dict]:
+    if workspace is None:
+        workspace = default_workspace()
+    personas = normalize_personas(workspace.get("personas"))
     if not personas:
         personas = [
             {"username": "jordan_consults", "background": "product consultant"},
@@ -133,19 +296,23 @@ def get_personas() -> List[Dict]:
                 p["voice"] = {"tone": "neutral", "brief": False, "quirk": ""}
     return personas
 
-def get_subreddits() -> List[str]:
-    raw = normalize_subreddits(load_json(DATA_DIR / "subreddits.json"))
+def get_subreddits(workspace: Workspace = None) -> List[str]:
+    if workspace is None:
+        workspace = default_workspace()
+    raw = normalize_subreddits(workspace.get("subreddits"))
     if raw:
         return raw
-    company_raw = load_json(DATA_DIR / "company.json")
-    if company_raw:
+    company_raw = workspace.get("company")
+    if isinstance(company_raw, dict):
         subs = normalize_subreddits(company_raw.get("Subreddits") or company_raw.get("subreddits"))
         if subs:
             return subs
     return ["r/PowerPoint", "r/Canva", "r/GoogleSlides", "r/AItools", "r/presentations"]
 
-def get_keywords() -> List[Dict]:
-    keywords = normalize_keywords(load_json(DATA_DIR / "keywords.json"))
+def get_keywords(workspace: Workspace = None) -> List[Dict]:
+    if workspace is None:
+        workspace = default_workspace()
+    keywords = normalize_keywords(workspace.get("keywords"))
     if not keywords:
         keywords = [
             {"id": "K1", "text": "best AI presentation maker"},
@@ -262,81 +429,98 @@ def choose_subreddit_template(subreddit: str) -> Dict:
         "comment_style": "neutral"
     }
 
-def persona_says(persona: Dict, text: str) -> str:
+def persona_says(persona: Dict, text: str, rng=random) -> str:
     voice = persona.get("voice", {"tone": "neutral", "brief": False, "quirk": ""})
     out = text
-    if voice.get("brief") and random.random() < 0.4:
+    if voice.get("brief") and rng.random() < 0.4:
         out = out.split(".")[0]
-    if voice.get("quirk") and random.random() < 0.5:
+    if voice.get("quirk") and rng.random() < 0.5:
         out = out + " " + voice["quirk"]
     # add casual realism
-    if random.random() < 0.3:
+    if rng.random() < 0.3:
         out = out.replace("Any tips appreciated!", "Any tips appreciated? 🙂").replace("Thanks in advance.", "Thanks! 🙏")
         out = out.replace("Would love to hear your thoughts.", "Would love your thoughts!").replace("\n\n", " ")
-    if random.random() < 0.2:
+    if rng.random() < 0.2:
         out += f" (in my experience)"
     return out
 
-def safe_sample(items: List, k: int):
+def safe_sample(items: List, k: int, rng=random):
     if not items:
         return []
     k = min(k, len(items))
-    return random.sample(items, k)
+    return rng.sample(items, k)
 
 # ------------------------------
 # Post & Comment Generators (Improved)
 # ------------------------------
-def build_title(persona: Dict, keyword: Dict, company_name: str, subreddit: str) -> str:
+COMMENT_TEMPLATES = [
+    "I've used {company} for {kw} and it saved me time.",
+    "For {kw} I usually export and tweak — {company} gives me a good starting point.",
+    "Not perfect, but {company} helps with {kw}. You'll need to adjust layouts.",
+    "+1 — {company} worked well for {kw} in my experience.",
+    "I tried exporting to Google Slides and then cleaned up spacing — quicker than starting from scratch.",
+    "Saved me a lot of time for {kw} 😊",
+    "I hate fixing fonts but {company} made the structure for {kw}.",
+    "Depends on use-case — for simple {kw} it's great, complex layouts need work."
+]
+DISAGREE_COMMENT_TEMPLATE = "Hmm, I found {company} a bit tricky for {kw} though others might like it."
+
+def _fingerprint(obj: Any) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+def _build_title(persona: Dict, keyword: Dict, company_name: str, subreddit: str, rng=random) -> Tuple[str, str]:
     template_set = choose_subreddit_template(subreddit)
-    t = random.choice(template_set["titles"]) if template_set.get("titles") else random.choice(GENERIC_TITLE_TEMPLATES)
+    t = rng.choice(template_set["titles"]) if template_set.get("titles") else rng.choice(GENERIC_TITLE_TEMPLATES)
     if "{kw}" in t or "{company}" in t:
-        return t.format(company=company_name, kw=keyword.get("text"))
-    if random.random() < 0.4:
-        return f"{t} — {keyword.get('text')}"
-    return t
+        return t.format(company=company_name, kw=keyword.get("text")), t
+    if rng.random() < 0.4:
+        return f"{t} — {keyword.get('text')}", t
+    return t, t
+
+def build_title(persona: Dict, keyword: Dict, company_name: str, subreddit: str, rng=random) -> str:
+    return _build_title(persona, keyword, company_name, subreddit, rng)[0]
 
-def build_body(persona: Dict, keywords: List[Dict], company: Dict, subreddit: str) -> str:
+def _build_body(persona: Dict, keywords: List[Dict], company: Dict, subreddit: str, rng=random) -> Tuple[str, str]:
     template_set = choose_subreddit_template(subreddit)
-    body = random.choice(template_set.get("bodies", GENERIC_BODY_TEMPLATES))
+    template = rng.choice(template_set.get("bodies", GENERIC_BODY_TEMPLATES))
     kw = keywords[0].get("text") if keywords else "this task"
     company_name = company.get("name") if isinstance(company, dict) else str(company)
-    body = body.format(company=company_name, kw=kw)
+    body = template.format(company=company_name, kw=kw)
     tails = [
         "\n\nAny tips appreciated!",
         "\n\nThanks in advance.",
         "\n\nWould love to hear your thoughts.",
         ""
     ]
-    tail = random.choice(tails)
-    if random.random() < 0.4:
+    tail = rng.choice(tails)
+    if rng.random() < 0.4:
         tail += f"\n\n— {persona.get('username')}"
     body = body + tail
-    return persona_says(persona, body)
+    return persona_says(persona, body, rng), template
 
-def generate_posts(num_posts: int = None, week_start: datetime = None) -> List[Dict]:
-    company = get_company()
-    personas = get_personas()
-    subreddits = get_subreddits()
-    keywords = get_keywords()
+def build_body(persona: Dict, keywords: List[Dict], company: Dict, subreddit: str, rng=random) -> str:
+    return _build_body(persona, keywords, company, subreddit, rng)[0]
 
-    if num_posts is None:
-        num_posts = company.get("num_posts_per_week", 3)
-    if week_start is None:
-        week_start = datetime.now()
+def _generate_posts(num_posts: int, week_start: datetime, workspace: Workspace, start_id: int = 1,
+                    persona_index: int = 0, used_pairs: set = None, rng=random) -> Tuple[List[Dict], Dict]:
+    company = get_company(workspace)
+    personas = get_personas(workspace)
+    subreddits = get_subreddits(workspace)
+    keywords = get_keywords(workspace)
 
     posts: List[Dict] = []
-    used_pairs = set()
-    i = 1
+    deps: Dict = {}
+    used_pairs = set() if used_pairs is None else used_pairs
+    i = start_id
     tries = 0
-    persona_index = 0
 
     while len(posts) < num_posts and tries < num_posts * 80:
         tries += 1
         persona = personas[persona_index % len(personas)]
         persona_index += 1
 
-        subreddit = random.choice(subreddits)
-        post_keywords = safe_sample(keywords, k=min(2, len(keywords)))
+        subreddit = rng.choice(subreddits)
+        post_keywords = safe_sample(keywords, k=min(2, len(keywords)), rng=rng)
         if not post_keywords:
             post_keywords = [{"id": "K1", "text": "general topic"}]
         keyword_ids = [kw.get("id") for kw in post_keywords]
@@ -346,15 +530,16 @@ def generate_posts(num_posts: int = None, week_start: datetime = None) -> List[D
             continue
         used_pairs.add(pair)
 
-        title = build_title(persona, post_keywords[0], company.get("name", "Company"), subreddit)
-        body = build_body(persona, post_keywords, company, subreddit)
+        title, title_template = _build_title(persona, post_keywords[0], company.get("name", "Company"), subreddit, rng)
+        body, body_template = _build_body(persona, post_keywords, company, subreddit, rng)
 
-        delta_days = random.randint(0, 6)
-        delta_hours = random.randint(9, 18) if random.random() < 0.8 else random.randint(0, 23)
+        delta_days = rng.randint(0, 6)
+        delta_hours = rng.randint(9, 18) if rng.random() < 0.8 else rng.randint(0, 23)
         ts = week_start + timedelta(days=delta_days, hours=delta_hours)
 
+        post_id = f"P{i}"
         posts.append({
-            "post_id": f"P{i}",
+            "post_id": post_id,
             "subreddit": subreddit,
             "title": title,
             "body": body,
@@ -362,95 +547,431 @@ def generate_posts(num_posts: int = None, week_start: datetime = None) -> List[D
             "timestamp": ts.strftime("%Y-%m-%d %H:%M"),
             "keyword_ids": ", ".join(keyword_ids)
         })
+        deps[post_id] = {
+            "persona": persona.get("username"),
+            "persona_fp": _fingerprint(persona),
+            "subreddit": subreddit,
+            "keywords": {kw.get("id"): kw.get("text") for kw in post_keywords},
+            "company": company.get("name"),
+            "templates": [title_template, body_template],
+        }
         i += 1
 
-    return posts
+    return posts, deps
 
-def generate_comments(posts: List[Dict], min_comments=2, max_comments=5) -> List[Dict]:
-    personas = get_personas()
-    company = get_company()
+def generate_posts(num_posts: int = None, week_start: datetime = None, workspace: Workspace = None,
+                   rng=random) -> List[Dict]:
+    if workspace is None:
+        workspace = default_workspace()
+    if num_posts is None:
+        num_posts = get_company(workspace).get("num_posts_per_week", 3)
+    if week_start is None:
+        week_start = datetime.now()
+    return _generate_posts(num_posts, week_start, workspace, rng=rng)[0]
+
+def _post_thread_context(post: Dict, global_keywords: Dict) -> Tuple[List[Tuple[str, str]], datetime]:
+    raw_kwids = [k.strip() for k in str(post.get("keyword_ids", "")).split(",") if k.strip()]
+    post_kws = [(kid, global_keywords.get(kid, kid)) for kid in raw_kwids] if raw_kwids else [(None, "this")]
+    try:
+        post_time = datetime.strptime(post.get("timestamp", ""), "%Y-%m-%d %H:%M")
+    except Exception:
+        post_time = datetime.now()
+    return post_kws, post_time
+
+def _build_comment(comment_id: str, post: Dict, post_time: datetime, post_kws: List[Tuple[str, str]],
+                   parent_id: str, persona: Dict, company: Dict, used_texts: set, position: int,
+                   rng=random) -> Tuple[Dict, Dict]:
+    kw_id, kw_ref = rng.choice(post_kws)
+    voice = persona.get("voice", {"tone": "neutral", "brief": False, "quirk": ""})
+    comment_variants = list(COMMENT_TEMPLATES)
+
+    # add mild disagreement or variation
+    if rng.random() < 0.25:
+        comment_variants.append(DISAGREE_COMMENT_TEMPLATE)
+
+    template = rng.choice(comment_variants)
+    text = template.format(company=company["name"], kw=kw_ref)
+    if voice.get("brief") and rng.random() < 0.5:
+        text = text.split(".")[0]
+    if voice.get("quirk") and rng.random() < 0.5:
+        text = text + " " + voice["quirk"]
+    if text in used_texts:
+        if rng.random() < 0.6:
+            text += ". " + rng.choice(["Worked for me.", "YMMV.", "Your mileage may vary."])
+        else:
+            text += "."
+
+    ts = post_time + timedelta(minutes=rng.randint(5, 180) + position * 4)
+    comment = {
+        "comment_id": comment_id,
+        "post_id": post.get("post_id"),
+        "parent_comment_id": parent_id,
+        "comment_text": text,
+        "username": persona.get("username", f"user{comment_id[1:]}"),
+        "timestamp": ts.strftime("%Y-%m-%d %H:%M")
+    }
+    deps = {
+        "post": post.get("post_id"),
+        "parent": parent_id,
+        "persona": persona.get("username"),
+        "persona_fp": _fingerprint(persona),
+        "keywords": {kw_id: kw_ref} if kw_id else {},
+        "company": company["name"],
+        "templates": [template],
+    }
+    return comment, deps
+
+def _generate_comments(posts: List[Dict], min_comments: int, max_comments: int, workspace: Workspace,
+                       start_id: int = 1, used_texts: set = None, rng=random) -> Tuple[List[Dict], Dict]:
+    personas = get_personas(workspace)
+    company = get_company(workspace)
+    global_keywords = {k["id"]: k["text"] for k in get_keywords(workspace)}
     comments = []
-    counter = 1
-    used_texts = set()
+    deps = {}
+    counter = start_id
+    used_texts = set() if used_texts is None else used_texts
 
     for post in posts:
-        raw_kwids = [k.strip() for k in str(post.get("keyword_ids", "")).split(",") if k.strip()]
-        global_keywords = {k["id"]: k["text"] for k in get_keywords()}
-        post_kw_texts = [global_keywords.get(kid, kid) for kid in raw_kwids] if raw_kwids else ["this"]
-        try:
-            post_time = datetime.strptime(post.get("timestamp", ""), "%Y-%m-%d %H:%M")
-        except Exception:
-            post_time = datetime.now()
-        num_comments = random.randint(min_comments, max_comments)
+        post_kws, post_time = _post_thread_context(post, global_keywords)
+        num_comments = rng.randint(min_comments, max_comments)
         thread_comments = []
 
         for n in range(num_comments):
-            persona = random.choice(personas)
-            if thread_comments and random.random() < 0.55:
-                parent = random.choice(thread_comments)
+            persona = rng.choice(personas)
+            if thread_comments and rng.random() < 0.55:
+                parent = rng.choice(thread_comments)
                 parent_id = parent["comment_id"]
             else:
                 parent_id = None
 
-            kw_ref = random.choice(post_kw_texts)
-            voice = persona.get("voice", {"tone": "neutral", "brief": False, "quirk": ""})
-            comment_variants = [
-                f"I've used {company['name']} for {kw_ref} and it saved me time.",
-                f"For {kw_ref} I usually export and tweak — {company['name']} gives me a good starting point.",
-                f"Not perfect, but {company['name']} helps with {kw_ref}. You'll need to adjust layouts.",
-                f"+1 — {company['name']} worked well for {kw_ref} in my experience.",
-                f"I tried exporting to Google Slides and then cleaned up spacing — quicker than starting from scratch.",
-                f"Saved me a lot of time for {kw_ref} 😊",
-                f"I hate fixing fonts but {company['name']} made the structure for {kw_ref}.",
-                f"Depends on use-case — for simple {kw_ref} it's great, complex layouts need work."
-            ]
-
-            # add mild disagreement or variation
-            if random.random() < 0.25:
-                comment_variants.append(f"Hmm, I found {company['name']} a bit tricky for {kw_ref} though others might like it.")
-
-            text = random.choice(comment_variants)
-            if voice.get("brief") and random.random() < 0.5:
-                text = text.split(".")[0]
-            if voice.get("quirk") and random.random() < 0.5:
-                text = text + " " + voice["quirk"]
-            if text in used_texts:
-                if random.random() < 0.6:
-                    text += ". " + random.choice(["Worked for me.", "YMMV.", "Your mileage may vary."])
-                else:
-                    text += "."
-
-            ts = post_time + timedelta(minutes=random.randint(5, 180) + len(thread_comments) * 4)
-            comment = {
-                "comment_id": f"C{counter}",
-                "post_id": post.get("post_id"),
-                "parent_comment_id": parent_id,
-                "comment_text": text,
-                "username": persona.get("username", f"user{counter}"),
-                "timestamp": ts.strftime("%Y-%m-%d %H:%M")
-            }
+            comment, deps[f"C{counter}"] = _build_comment(
+                f"C{counter}", post, post_time, post_kws, parent_id, persona, company, used_texts, len(thread_comments), rng
+            )
             comments.append(comment)
             thread_comments.append(comment)
-            used_texts.add(text)
+            used_texts.add(comment["comment_text"])
             counter += 1
 
-    return comments
+    return comments, deps
+
+def generate_comments(posts: List[Dict], min_comments=2, max_comments=5, workspace: Workspace = None,
+                      rng=random) -> List[Dict]:
+    if workspace is None:
+        workspace = default_workspace()
+    return _generate_comments(posts, min_comments, max_comments, workspace, rng=rng)[0]
+
+# ------------------------------
+# Week plans & incremental re-planning
+# ------------------------------
+def _id_number(item_id: str) -> int:
+    try:
+        return int(str(item_id)[1:])
+    except ValueError:
+        return 0
+
+def _input_context(workspace: Workspace) -> Dict:
+    return {
+        "company": get_company(workspace).get("name"),
+        "personas": {p.get("username"): _fingerprint(p) for p in get_personas(workspace)},
+        "subreddits": set(get_subreddits(workspace)),
+        "keywords": {k.get("id"): k.get("text") for k in get_keywords(workspace)},
+    }
+
+def _inputs_changed(dep: Dict, ctx: Dict) -> bool:
+    if dep is None:
+        return True
+    if ctx["personas"].get(dep.get("persona")) != dep.get("persona_fp"):
+        return True
+    if dep.get("company") != ctx["company"]:
+        return True
+    return any(ctx["keywords"].get(kid) != text for kid, text in dep.get("keywords", {}).items())
+
+def _post_is_stale(dep: Dict, ctx: Dict) -> bool:
+    if _inputs_changed(dep, ctx) or dep.get("subreddit") not in ctx["subreddits"]:
+        return True
+    template_set = choose_subreddit_template(dep["subreddit"])
+    titles = template_set.get("titles") or GENERIC_TITLE_TEMPLATES
+    bodies = template_set.get("bodies", GENERIC_BODY_TEMPLATES)
+    title_template, body_template = dep.get("templates", [None, None])
+    return title_template not in titles or body_template not in bodies
+
+def _comment_is_stale(dep: Dict, ctx: Dict) -> bool:
+    if _inputs_changed(dep, ctx):
+        return True
+    return dep.get("templates", [None])[0] not in COMMENT_TEMPLATES + [DISAGREE_COMMENT_TEMPLATE]
+
+def plan_week(num_posts: int = None, week_start: datetime = None, workspace: Workspace = None,
+              min_comments: int = 2, max_comments: int = 5, rng=random) -> Dict:
+    """Generate a week like generate_posts + generate_comments, keeping what each item depended on.
+
+    The returned plan is JSON-serializable; pass it to replan_week after the inputs change.
+    Randomness comes from `rng` (the module-level RNG unless a random.Random is given).
+    """
+    if workspace is None:
+        workspace = default_workspace()
+    if week_start is None:
+        week_start = datetime.now()
+    target = num_posts if num_posts is not None else get_company(workspace).get("num_posts_per_week", 3)
+    posts, post_deps = _generate_posts(target, week_start, workspace, rng=rng)
+    comments, comment_deps = _generate_comments(posts, min_comments, max_comments, workspace, rng=rng)
+    return {
+        "week_start": week_start.strftime("%Y-%m-%d %H:%M"),
+        "num_posts": num_posts,
+        "comment_range": [min_comments, max_comments],
+        "posts": posts,
+        "comments": comments,
+        "deps": {**post_deps, **comment_deps},
+        "next_ids": {"post": len(posts) + 1, "comment": len(comments) + 1},
+        "regenerated": [p["post_id"] for p in posts] + [c["comment_id"] for c in comments],
+        "removed": [],
+    }
+
+def replan_week(plan: Dict, workspace: Workspace = None, rng=random) -> Dict:
+    """Regenerate only the items of `plan` whose recorded inputs no longer match the workspace.
+
+    Unaffected posts and comments are kept as-is with their IDs. A stale post is
+    dropped together with its thread and replaced by a new post (new ID); a stale
+    comment, or a reply to one, is rewritten in place of the old one under a new ID.
+    """
+    if workspace is None:
+        workspace = default_workspace()
+    ctx = _input_context(workspace)
+    deps = plan.get("deps", {})
+    week_start = datetime.strptime(plan["week_start"], "%Y-%m-%d %H:%M")
+    min_comments, max_comments = plan.get("comment_range", [2, 5])
+    next_ids = dict(plan.get("next_ids") or {
+        "post": max([_id_number(p["post_id"]) for p in plan["posts"]], default=0) + 1,
+        "comment": max([_id_number(c["comment_id"]) for c in plan["comments"]], default=0) + 1,
+    })
+
+    target = plan.get("num_posts")
+    if target is None:
+        target = get_company(workspace).get("num_posts_per_week", 3)
+    kept_posts = [p for p in plan["posts"] if not _post_is_stale(deps.get(p["post_id"]), ctx)][:target]
+    kept_post_ids = {p["post_id"] for p in kept_posts}
+    used_pairs = {
+        (deps[p["post_id"]]["subreddit"].lower(), tuple(sorted(deps[p["post_id"]]["keywords"])))
+        for p in kept_posts
+    }
+    new_posts, new_deps = _generate_posts(
+        target - len(kept_posts), week_start, workspace,
+        start_id=next_ids["post"], persona_index=len(kept_posts), used_pairs=used_pairs, rng=rng,
+    )
+    next_ids["post"] += len(new_posts)
+
+    # comments on kept posts: keep the fresh ones, rewrite stale ones (and replies to them) in place
+    thread_comments = [c for c in plan["comments"] if c.get("post_id") in kept_post_ids]
+    stale = set()
+    for c in thread_comments:
+        if c.get("parent_comment_id") in stale or _comment_is_stale(deps.get(c["comment_id"]), ctx):
+            stale.add(c["comment_id"])
+    used_texts = {c["comment_text"] for c in thread_comments if c["comment_id"] not in stale}
+
+    personas = get_personas(workspace)
+    company = get_company(workspace)
+    global_keywords = dict(ctx["keywords"])
+    posts_by_id = {p["post_id"]: p for p in kept_posts}
+    positions: Dict[str, int] = {}
+    replaced: Dict[str, str] = {}
+    comments = []
+    for c in thread_comments:
+        position = positions.get(c["post_id"], 0)
+        positions[c["post_id"]] = position + 1
+        if c["comment_id"] not in stale:
+            comments.append(c)
+            new_deps[c["comment_id"]] = deps[c["comment_id"]]
+            continue
+        post = posts_by_id[c["post_id"]]
+        post_kws, post_time = _post_thread_context(post, global_keywords)
+        comment_id = f"C{next_ids['comment']}"
+        next_ids["comment"] += 1
+        parent_id = replaced.get(c.get("parent_comment_id"), c.get("parent_comment_id"))
+        comment, new_deps[comment_id] = _build_comment(
+            comment_id, post, post_time, post_kws, parent_id, rng.choice(personas), company, used_texts, position, rng
+        )
+        replaced[c["comment_id"]] = comment_id
+        used_texts.add(comment["comment_text"])
+        comments.append(comment)
+
+    new_comments, new_comment_deps = _generate_comments(
+        new_posts, min_comments, max_comments, workspace, start_id=next_ids["comment"], used_texts=used_texts, rng=rng,
+    )
+    next_ids["comment"] += len(new_comments)
+    comments.extend(new_comments)
+    new_deps.update(new_comment_deps)
+    for p in kept_posts:
+        new_deps[p["post_id"]] = deps[p["post_id"]]
+
+    posts = kept_posts + new_posts
+    current_ids = {p["post_id"] for p in posts} | {c["comment_id"] for c in comments}
+    previous_ids = [p["post_id"] for p in plan["posts"]] + [c["comment_id"] for c in plan["comments"]]
+    return {
+        "week_start": plan["week_start"],
+        "num_posts": plan.get("num_posts"),
+        "comment_range": [min_comments, max_comments],
+        "posts": posts,
+        "comments": comments,
+        "deps": new_deps,
+        "next_ids": next_ids,
+        "regenerated": [p["post_id"] for p in new_posts] + list(replaced.values()) + [c["comment_id"] for c in new_comments],
+        "removed": [item_id for item_id in previous_ids if item_id not in current_ids],
+    }
+
+# ------------------------------
+# Multi-seed search (best-of-K week plans)
+# ------------------------------
+def _plan_repetition(plan: Dict) -> int:
+    """Count posts reusing a title template and comments reusing a template within their thread."""
+    deps = plan["deps"]
+    repeats = 0
+    seen = set()
+    for p in plan["posts"]:
+        key = ("title", deps[p["post_id"]]["templates"][0])
+        repeats += key in seen
+        seen.add(key)
+    for c in plan["comments"]:
+        key = (c["post_id"], deps[c["comment_id"]]["templates"][0])
+        repeats += key in seen
+        seen.add(key)
+    return repeats
+
+def _score_candidate(seed: int, num_posts: int, week_start: datetime, workspace: Workspace) -> Dict:
+    # a private RNG per candidate, so concurrent generations never share random state
+    plan = plan_week(num_posts=num_posts, week_start=week_start, workspace=workspace, rng=random.Random(seed))
+    score, details = score_calendar(plan["posts"], plan["comments"], workspace=workspace)
+    return {
+        "seed": seed,
+        "score": score,
+        "penalty": details_penalty(details),
+        "repetition": _plan_repetition(plan),
+        "details": details,
+        "plan": plan,
+    }
+
+# below this much estimated in-process work, starting/feeding a worker pool costs more than it saves
+SEARCH_POOL_MIN_SECONDS = 2.0
+_search_pools: Dict[int, ProcessPoolExecutor] = {}
+_search_pools_lock = threading.Lock()
+
+def _search_pool(max_workers: int) -> ProcessPoolExecutor:
+    # long-lived and shared by every search, so the spawn start-up is paid once per process
+    with _search_pools_lock:
+        pool = _search_pools.get(max_workers)
+        if pool is None:
+            # spawn rather than fork: callers such as the Streamlit server are multithreaded
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _search_pools[max_workers] = pool
+        return pool
+
+def _score_candidates(seeds: List[int], num_posts: int, week_start: datetime, workspace: Workspace,
+                      deadline: float = None, target_score: float = None) -> List[Dict]:
+    """Score seeds in order, stopping after the first one reaching target_score or at the wall-clock deadline."""
+    results = []
+    for seed in seeds:
+        if deadline is not None and time.time() >= deadline:
+            break
+        result = _score_candidate(seed, num_posts, week_start, workspace)
+        results.append(result)
+        if target_score is not None and result["score"] >= target_score:
+            break
+    return results
+
+def search_best_week(candidates: int = 8, master_seed: int = 0, num_posts: int = None, week_start: datetime = None,
+                     workspace: Workspace = None, target_score: float = None, time_budget: float = None,
+                     max_workers: int = None) -> Dict:
+    """Generate up to `candidates` week plans from different seeds and keep the best one.
+
+    Candidates are ranked by their uncapped score_calendar penalty, then by template
+    repetition, since most seeds reach the 10/10 ceiling. Seeds are derived from
+    master_seed and results are consumed in seed order, so the outcome is reproducible
+    unless the time budget cuts the run short. Stops early at the first candidate
+    scoring >= target_score or once time_budget seconds have passed; the first
+    candidate is always evaluated, so a result is returned even on a tiny budget.
+
+    Seeds are fanned out in batches to a shared process pool only when the estimated
+    in-process work exceeds SEARCH_POOL_MIN_SECONDS; max_workers=1 never uses a pool.
+    """
+    if workspace is None:
+        workspace = default_workspace()
+    if week_start is None:
+        week_start = datetime.now()
+    seed_rng = random.Random(master_seed)
+    seeds = [seed_rng.getrandbits(32) for _ in range(max(1, int(candidates)))]
+    if max_workers is None:
+        max_workers = min(len(seeds), os.cpu_count() or 1)
+
+    def reached_target(result) -> bool:
+        return target_score is not None and result["score"] >= target_score
+
+    started = time.perf_counter()
+    deadline = None if time_budget is None else time.time() + time_budget
+    # the first candidate runs in-process; its cost decides whether a pool would pay off
+    results = [_score_candidate(seeds[0], num_posts, week_start, workspace)]
+    per_candidate = time.perf_counter() - started
+    rest = [] if reached_target(results[0]) else seeds[1:]
+
+    if rest and (max_workers <= 1 or per_candidate * len(rest) < SEARCH_POOL_MIN_SECONDS):
+        results += _score_candidates(rest, num_posts, week_start, workspace, deadline, target_score)
+    elif rest:
+        pool = _search_pool(max_workers)
+        batch_size = max(1, -(-len(rest) // (max_workers * 4)))
+        batches = [rest[i:i + batch_size] for i in range(0, len(rest), batch_size)]
+        futures = [
+            pool.submit(_score_candidates, batch, num_posts, week_start, workspace, deadline, target_score)
+            for batch in batches
+        ]
+        try:
+            for batch, future in zip(batches, futures):
+                timeout = None if deadline is None else max(0, deadline - time.time())
+                try:
+                    batch_results = future.result(timeout=timeout)
+                except FuturesTimeout:
+                    break
+                results += batch_results
+                if len(batch_results) < len(batch) or (batch_results and reached_target(batch_results[-1])):
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+
+    if reached_target(results[-1]):
+        stopped = "target"
+    elif len(results) == len(seeds):
+        stopped = "exhausted"
+    else:
+        stopped = "time_budget"
+
+    elapsed = time.perf_counter() - started
+    # lowest penalty, then least repetition; ties go to the earliest seed
+    best = min(results, key=lambda r: (r["penalty"], r["repetition"]))
+    return {
+        "plan": best["plan"],
+        "score": best["score"],
+        "penalty": best["penalty"],
+        "repetition": best["repetition"],
+        "details": best["details"],
+        "seed": best["seed"],
+        "master_seed": master_seed,
+        "candidates": [{k: r[k] for k in ("seed", "score", "penalty", "repetition")} for r in results],
+        "evaluated": len(results),
+        "stopped": stopped,
+        "elapsed": round(elapsed, 3),
+        "candidates_per_sec": round(len(results) / elapsed, 2) if elapsed > 0 else float(len(results)),
+    }
 
 # ------------------------------
 # Scoring / Quality checks
 # ------------------------------
-def score_calendar(posts: List[Dict], comments: List[Dict]) -> Tuple[float, Dict]:
-    base = 100.0
+def score_calendar(posts: List[Dict], comments: List[Dict], workspace: Workspace = None) -> Tuple[float, Dict]:
     details = {"duplicate_pairs": 0, "orphan_comments": 0, "persona_mismatch": 0, "repeated_comments": 0}
     seen = set()
 
-    personas = get_personas()
+    personas = get_personas(workspace)
     persona_usernames = {p.get("username") for p in personas if p.get("username")}
 
     for p in posts:
         pair = (p.get("subreddit", "").lower(), p.get("keyword_ids", ""))
         if pair in seen:
-            base -= 12
             details["duplicate_pairs"] += 1
         seen.add(pair)
 
@@ -458,19 +979,190 @@ def score_calendar(posts: List[Dict], comments: List[Dict]) -> Tuple[float, Dict
     for c in comments:
         if c.get("parent_comment_id") and c.get("parent_comment_id") not in valid_comment_ids:
             details["orphan_comments"] += 1
-            base -= 6
         if c.get("username") not in persona_usernames:
             details["persona_mismatch"] += 1
-            base -= 4
 
     texts = [c.get("comment_text") for c in comments]
     duplicates = len(texts) - len(set(texts))
     if duplicates > 0:
         details["repeated_comments"] = duplicates
-        base -= min(20, duplicates * 2)
 
-    final = max(0, min(10, round(base / 10, 1)))
-    return final, details
+    return score_from_details(details), details
+
+def details_penalty(details: Dict) -> int:
+    """Total score_calendar penalty points, without the 20-point repeated-comment cap."""
+    return (details.get("duplicate_pairs", 0) * 12
+            + details.get("orphan_comments", 0) * 6
+            + details.get("persona_mismatch", 0) * 4
+            + details.get("repeated_comments", 0) * 2)
+
+def score_from_details(details: Dict) -> float:
+    base = 100.0
+    base -= details.get("duplicate_pairs", 0) * 12
+    base -= details.get("orphan_comments", 0) * 6
+    base -= details.get("persona_mismatch", 0) * 4
+    base -= min(20, details.get("repeated_comments", 0) * 2)
+    return max(0, min(10, round(base / 10, 1)))
+
+# ------------------------------
+# Offline scoring (exported CSV / parquet files)
+# ------------------------------
+BREAKDOWN_KEYS = ["week", "subreddit", "persona"]
+BREAKDOWN_METRICS = ["posts", "comments", "duplicate_pairs", "orphan_comments", "persona_mismatch", "repeated_comments"]
+POST_COLUMNS = ["post_id", "subreddit", "author_username", "timestamp", "keyword_ids"]
+COMMENT_COLUMNS = ["comment_id", "post_id", "parent_comment_id", "comment_text", "username", "timestamp"]
+
+def _as_path_list(paths: Union[str, Path, List]) -> List[Path]:
+    if isinstance(paths, (str, Path)):
+        return [Path(paths)]
+    return [Path(p) for p in paths]
+
+def _iter_export_chunks(paths: List[Path], columns: List[str], chunksize: int) -> Iterator:
+    import pandas as pd
+    for path in paths:
+        if path.suffix.lower() in (".parquet", ".pq"):
+            try:
+                import pyarrow.parquet as pq
+            except Exception:
+                raise RuntimeError("pyarrow required for parquet files - please install pyarrow")
+            pf = pq.ParquetFile(path)
+            present = [c for c in columns if c in pf.schema_arrow.names]
+            chunks = (batch.to_pandas().fillna("").astype(str) for batch in pf.iter_batches(batch_size=chunksize, columns=present))
+        else:
+            try:
+                chunks = pd.read_csv(path, dtype=str, keep_default_na=False, usecols=lambda c: c in columns, chunksize=chunksize)
+            except pd.errors.EmptyDataError:
+                # export_csv(posts, []) writes a headerless file: no rows
+                continue
+        for chunk in chunks:
+            for col in columns:
+                if col not in chunk.columns:
+                    chunk[col] = ""
+            yield chunk[columns].reset_index(drop=True)
+
+def _week_start(timestamps):
+    import pandas as pd
+    # timestamps repeat a lot, so parse each distinct value once
+    codes, uniques = pd.factorize(timestamps)
+    ts = pd.Series(pd.to_datetime(uniques, format="%Y-%m-%d %H:%M", errors="coerce"))
+    monday = ts.dt.normalize() - pd.to_timedelta(ts.dt.weekday, unit="D")
+    return monday.dt.strftime("%Y-%m-%d").fillna("").to_numpy(dtype=object)[codes]
+
+def _group_codes(frame, registry: Dict) -> Any:
+    """Map each row's (week, subreddit, persona) to a stable integer code shared across chunks."""
+    import numpy as np
+    import pandas as pd
+    combined = np.zeros(len(frame), dtype=np.int64)
+    levels = []
+    for key in BREAKDOWN_KEYS:
+        codes, uniques = pd.factorize(frame[key])
+        combined = combined * len(uniques) + codes
+        levels.append(uniques)
+    codes, combos = pd.factorize(combined)
+    parts = []
+    for uniques in reversed(levels):
+        combos, positions = np.divmod(combos, len(uniques))
+        parts.append(np.asarray(uniques)[positions])
+    keys = zip(*reversed(parts))
+    lookup = np.array([registry.setdefault(key, len(registry)) for key in keys], dtype=np.int64)
+    return lookup[codes]
+
+def score_calendar_files(posts_files, comments_files, personas: List[Dict] = None, chunksize: int = 50_000,
+                         workspace: Workspace = None):
+    """Score exported weekly_posts / weekly_comments files without loading them as dicts.
+
+    Files are read in chunks (CSV, or parquet when pyarrow is installed). Each chunk is
+    reduced to integer group codes and 64-bit hashes of the columns the checks compare,
+    and the cross-chunk checks (duplicates, repeats, orphans) run once over those arrays
+    at the end. Returns (score, details, breakdown) where score/details match
+    score_calendar on the same rows and breakdown is a DataFrame indexed by
+    (week, subreddit, persona). Personas come from `personas` if given, else from the
+    workspace.
+    """
+    try:
+        import numpy as np
+        import pandas as pd
+    except Exception:
+        raise RuntimeError("pandas required for score_calendar_files - please install pandas")
+
+    def hashes(obj):
+        return pd.util.hash_pandas_object(obj, index=False).to_numpy()
+
+    if personas is None:
+        personas = get_personas(workspace)
+    persona_usernames = {p.get("username") for p in personas if p.get("username")}
+
+    groups: Dict[Tuple[str, str, str], int] = {}
+    post_codes, pair_hashes, post_subreddits = [], [], []
+    for chunk in _iter_export_chunks(_as_path_list(posts_files), POST_COLUMNS, chunksize):
+        frame = pd.DataFrame({
+            "week": _week_start(chunk["timestamp"]),
+            "subreddit": chunk["subreddit"],
+            "persona": chunk["author_username"],
+        })
+        post_codes.append(_group_codes(frame, groups))
+        pair_hashes.append(hashes(pd.DataFrame({"subreddit": chunk["subreddit"].str.lower(), "keyword_ids": chunk["keyword_ids"]})))
+        post_subreddits.append(chunk[["post_id", "subreddit"]])
+
+    # comments look their post's subreddit up by hashed post_id (first post with that id wins)
+    post_subreddits = pd.concat(post_subreddits) if post_subreddits else pd.DataFrame({"post_id": [], "subreddit": []}, dtype=str)
+    post_id_hashes = hashes(post_subreddits["post_id"])
+    first = ~pd.Series(post_id_hashes).duplicated().to_numpy()
+    post_index = pd.Index(post_id_hashes[first])
+    subreddit_values = np.append(post_subreddits["subreddit"].to_numpy(dtype=object)[first], "")
+
+    comment_codes, mismatches, text_hashes, id_hashes, reply_codes, parent_hashes = [], [], [], [], [], []
+    for chunk in _iter_export_chunks(_as_path_list(comments_files), COMMENT_COLUMNS, chunksize):
+        frame = pd.DataFrame({
+            "week": _week_start(chunk["timestamp"]),
+            # get_indexer gives -1 for unknown posts, which picks the trailing ""
+            "subreddit": subreddit_values[post_index.get_indexer(hashes(chunk["post_id"]))],
+            "persona": chunk["username"],
+        })
+        codes = _group_codes(frame, groups)
+        comment_codes.append(codes)
+        mismatches.append(~chunk["username"].isin(persona_usernames).to_numpy())
+        text_hashes.append(hashes(chunk["comment_text"]))
+        id_hashes.append(hashes(chunk["comment_id"]))
+        has_parent = (chunk["parent_comment_id"] != "").to_numpy()
+        reply_codes.append(codes[has_parent])
+        parent_hashes.append(hashes(chunk["parent_comment_id"][has_parent]))
+
+    def joined(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    def per_group(codes, flags=None):
+        return np.bincount(codes, weights=flags, minlength=len(groups)).astype(np.int64)
+
+    post_codes = joined(post_codes, np.int64)
+    comment_codes = joined(comment_codes, np.int64)
+    reply_codes = joined(reply_codes, np.int64)
+    # first occurrence is fine, every later one counts (same rule as score_calendar)
+    duplicate = pd.Series(joined(pair_hashes, np.uint64)).duplicated().to_numpy()
+    repeated = pd.Series(joined(text_hashes, np.uint64)).duplicated().to_numpy()
+    # orphans can only be resolved once every comment_id has been seen
+    orphan = ~pd.Series(joined(parent_hashes, np.uint64)).isin(joined(id_hashes, np.uint64)).to_numpy()
+
+    index = pd.MultiIndex.from_tuples(list(groups), names=BREAKDOWN_KEYS) if groups else \
+        pd.MultiIndex.from_arrays([[], [], []], names=BREAKDOWN_KEYS)
+    breakdown = pd.DataFrame({
+        "posts": per_group(post_codes),
+        "comments": per_group(comment_codes),
+        "duplicate_pairs": per_group(post_codes, duplicate),
+        "orphan_comments": per_group(reply_codes, orphan),
+        "persona_mismatch": per_group(comment_codes, joined(mismatches, bool)),
+        "repeated_comments": per_group(comment_codes, repeated),
+    }, index=index).sort_index()
+
+    base = (100
+            - breakdown["duplicate_pairs"] * 12
+            - breakdown["orphan_comments"] * 6
+            - breakdown["persona_mismatch"] * 4
+            - (breakdown["repeated_comments"] * 2).clip(upper=20))
+    breakdown["score"] = (base / 10).round(1).clip(0, 10)
+
+    details = {k: int(breakdown[k].sum()) for k in ("duplicate_pairs", "orphan_comments", "persona_mismatch", "repeated_comments")}
+    return score_from_details(details), details, breakdown
 
 # ------------------------------
 # Export helper
@@ -0,0 +1,40 @@
+import random
+
+import reddit_algorithm as ra
+
+
+def _plan(seed=2):
+    workspace = ra.default_workspace().copy("test")
+    random.seed(seed)
+    return workspace, ra.plan_week(workspace=workspace, week_start=ra.datetime(2025, 1, 6))
+
+
+def test_unchanged_inputs_keep_everything():
+    workspace, plan = _plan()
+    replanned = ra.replan_week(plan, workspace)
+    assert replanned["posts"] == plan["posts"]
+    assert replanned["comments"] == plan["comments"]
+    assert replanned["regenerated"] == []
+
+
+def test_deleting_a_keyword_row_only_touches_its_posts():
+    workspace, plan = _plan()
+    keywords = ra.get_keywords(workspace)
+    dropped = plan["posts"][0]["keyword_ids"].split(", ")[0]
+    texts = [k["text"] for k in keywords if k["id"] != dropped]
+    workspace.set("keywords", ra.assign_keyword_ids(texts, previous=keywords))
+
+    replanned = ra.replan_week(plan, workspace)
+    kept = [p for p in plan["posts"] if dropped not in p["keyword_ids"].split(", ")]
+    assert [p for p in replanned["posts"] if p in plan["posts"]] == kept
+    assert all(p["post_id"] in replanned["removed"] for p in plan["posts"] if p not in kept)
+
+
+def test_assign_keyword_ids_reuses_and_respects_ids():
+    previous = [{"id": "K1", "text": "a"}, {"id": "K2", "text": "b"}, {"id": "K3", "text": "c"}]
+    assert ra.assign_keyword_ids(["a", "c", "d"], previous=previous) == [
+        {"id": "K1", "text": "a"}, {"id": "K3", "text": "c"}, {"id": "K4", "text": "d"},
+    ]
+    assert ra.assign_keyword_ids(["x", "b"], previous=previous, ids=["K9", ""]) == [
+        {"id": "K9", "text": "x"}, {"id": "K2", "text": "b"},
+    ]
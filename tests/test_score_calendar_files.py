@@ -0,0 +1,46 @@
+import csv
+import random
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import reddit_algorithm as ra
+
+
+def _read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_score_calendar(tmp_path, seed):
+    random.seed(seed)
+    posts = ra.generate_posts(num_posts=random.randint(1, 12))
+    comments = ra.generate_comments(posts)
+    # inject every kind of fault score_calendar looks for
+    posts += posts[:2]
+    comments[0]["parent_comment_id"] = "C999"
+    comments[1]["username"] = "ghost"
+    comments += comments[:3]
+    ra.export_csv(posts, comments, tmp_path)
+
+    expected = ra.score_calendar(_read_rows(tmp_path / "weekly_posts.csv"), _read_rows(tmp_path / "weekly_comments.csv"))
+    score, details, breakdown = ra.score_calendar_files(
+        tmp_path / "weekly_posts.csv", tmp_path / "weekly_comments.csv", chunksize=3
+    )
+
+    assert (score, details) == expected
+    for key, value in details.items():
+        assert breakdown[key].sum() == value
+    assert breakdown["posts"].sum() == len(posts)
+    assert breakdown["comments"].sum() == len(comments)
+
+
+def test_empty_comments_export(tmp_path):
+    random.seed(0)
+    posts = ra.generate_posts(num_posts=3)
+    ra.export_csv(posts, [], tmp_path)
+
+    score, details, _ = ra.score_calendar_files(tmp_path / "weekly_posts.csv", tmp_path / "weekly_comments.csv")
+    assert (score, details) == ra.score_calendar(_read_rows(tmp_path / "weekly_posts.csv"), [])